@@ -0,0 +1,94 @@
+"""Caching loaded audio samples between runs"""
+
+import hashlib
+import os
+from typing import Optional
+
+import numpy as np
+
+from desstv import util
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "desstv")
+# Caching can be turned off by setting DESSTV_NO_CACHE environment variable (or with --no-cache)
+CACHE_ENABLED = not os.environ.get("DESSTV_NO_CACHE")
+# Bump this when the way audio is loaded changes (mixing down, resampling, dtype...),
+# so the samples cached by older versions are loaded again
+CACHE_VERSION = 2
+# Only the most recently used audio files are kept, each cache file is about 10.6MB per minute of 44.1khz audio
+MAX_CACHE_FILES = 8
+
+
+def get_cache_file_path(audio_file_path: str) -> str:
+    """Each audio file has one cache file, named by the hash of its absolute path"""
+
+    key = hashlib.sha256(os.path.abspath(audio_file_path).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.npz")
+
+
+def get_file_stamp(audio_file_path: str) -> np.ndarray:
+    """
+    The cache version and the audio file's modification time and size,
+    if any of them changes, the cache is outdated.
+    """
+
+    stat = os.stat(audio_file_path)
+    return np.array([CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def load_samples(audio_file_path: str) -> Optional[tuple[np.ndarray, int]]:
+    """
+    Returns the cached (samples, sample_rate) of the audio file,
+    or None if there is no cache or it's outdated.
+    """
+
+    cache_file_path = get_cache_file_path(audio_file_path)
+    if not os.path.exists(cache_file_path):
+        return None
+
+    try:
+        with np.load(cache_file_path, allow_pickle=False) as cached:
+            if not np.array_equal(cached["stamp"], get_file_stamp(audio_file_path)):
+                return None
+            samples, sample_rate = cached["samples"], int(cached["sample_rate"])
+    except (OSError, ValueError, KeyError):
+        # Broken cache file, just load the audio file again
+        return None
+
+    # Mark it as recently used, so it's not removed as an old cache file
+    try:
+        os.utime(cache_file_path)
+    except OSError:
+        pass
+    return samples, sample_rate
+
+
+def save_samples(audio_file_path: str, samples: np.ndarray, sample_rate: int):
+    """Caches the loaded (samples, sample_rate) of the audio file, replacing the outdated one if exists"""
+
+    cache_file_path = get_cache_file_path(audio_file_path)
+    # Write to a temporary file first, so an interrupted run never leaves a broken cache file
+    temp_file_path = f"{cache_file_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(temp_file_path, "wb") as fp:
+            np.savez(fp, samples=samples, sample_rate=sample_rate, stamp=get_file_stamp(audio_file_path))
+        os.replace(temp_file_path, cache_file_path)
+    except OSError as e:
+        util.log_warn("Failed to cache loaded audio: %s", e)
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        return
+
+    remove_old_cache_files()
+
+
+def remove_old_cache_files():
+    """Removes cache files except the most recently used ones"""
+
+    try:
+        cache_file_paths = [entry.path for entry in os.scandir(CACHE_DIR) if entry.name.endswith(".npz")]
+        cache_file_paths.sort(key=os.path.getmtime, reverse=True)
+        for cache_file_path in cache_file_paths[MAX_CACHE_FILES:]:
+            os.remove(cache_file_path)
+    except OSError as e:
+        util.log_warn("Failed to remove old cache files: %s", e)
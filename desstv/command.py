@@ -2,16 +2,25 @@
 
 import argparse
 import os.path
+from functools import lru_cache
 from sys import exit
-from typing import BinaryIO
-
-from PIL import Image
-from soundfile import available_formats as available_audio_formats
+from typing import BinaryIO, Optional
 
 from desstv import util
-from desstv.convert import AdditionalAudioFormatSupport
-from desstv.decode import SSTVDecoder
-from desstv.spec import VIS_MAP
+from desstv.spec import SUPPORTED_MODE_NAMES
+
+# Heavy modules (PIL, soundfile, pydub, scipy...) are imported in the methods using them,
+# so that "--help" and "--list-*" don't wait for them.
+
+
+@lru_cache(maxsize=None)
+def get_supported_image_formats() -> tuple[str, ...]:
+    """Image formats that PIL can save, collecting them walks through every PIL plugin so do it only once"""
+
+    from PIL import Image
+
+    Image.init()
+    return tuple(Image.SAVE.keys())
 
 
 class SSTVCommand(object):
@@ -37,13 +46,34 @@ examples:
 
         audio_file = self.args.audio_file
         if not os.path.exists(audio_file):
-            util.log_error("No such file or directory: [{}]".format(audio_file))
+            util.log_error("No such file or directory: [%s]", audio_file)
             exit(2)
-        self._audio_file: BinaryIO = AdditionalAudioFormatSupport.handle_audio_file(audio_file)
+
+        from desstv import cache
+
+        # Audio samples loaded by previous runs, if we have them, the audio file needn't be opened at all
+        self._use_cache = self.args.use_cache and cache.CACHE_ENABLED
+        self._cached_audio = cache.load_samples(audio_file) if self._use_cache else None
+        self._audio_file: Optional[BinaryIO] = None
+        if self._cached_audio is None:
+            # Converting audio formats imports pydub, don't import it if we don't open the file
+            from desstv.convert import AdditionalAudioFormatSupport
+
+            self._audio_file = AdditionalAudioFormatSupport.handle_audio_file(audio_file)
 
     def parse_args(self, shell_args):
         """Parse command line arguments"""
 
+        # Fast path: the list commands don't need the parser at all
+        list_commands = {
+            "--list-modes": self.list_supported_modes,
+            "--list-audio-formats": self.list_supported_audio_formats,
+            "--list-image-formats": self.list_supported_image_formats,
+        }
+        if len(shell_args) == 1 and shell_args[0] in list_commands:
+            list_commands[shell_args[0]]()
+            exit(0)
+
         parser = self.build_parser()
         args = parser.parse_args(shell_args)
 
@@ -83,6 +113,12 @@ examples:
         parser.add_argument(
             "-s", "--skip", type=float, help="time in seconds to start decoding signal at", default=0.0, dest="skip"
         )
+        parser.add_argument(
+            "--no-cache",
+            action="store_false",
+            dest="use_cache",
+            help="don't use or save the cache of loaded audio",
+        )
         parser.add_argument("-V", "--version", action="version", version=version)
         parser.add_argument("--list-modes", action="store_true", dest="list_modes", help="list supported SSTV modes")
         parser.add_argument(
@@ -111,10 +147,22 @@ examples:
     def start(self):
         """Start decoder"""
 
-        with SSTVDecoder(self._audio_file) as sstv:
+        from desstv import cache
+        from desstv.decode import SSTVDecoder
+
+        if self._cached_audio is not None:
+            util.log_info("Using cached audio of [%s]", self.args.audio_file)
+            audio = self._cached_audio
+        else:
+            audio = self._audio_file
+
+        with SSTVDecoder(audio) as sstv:
+            if self._use_cache and self._cached_audio is None:
+                cache.save_samples(self.args.audio_file, *sstv.loaded_audio())
+
             img = sstv.decode(self._skip)
             if img is None:
-                util.log_error(f"No SSTV signal found in [{self._audio_file}]")
+                util.log_error("No SSTV signal found in [%s]", self.args.audio_file)
                 exit(2)
 
             try:
@@ -133,17 +181,20 @@ examples:
 
     @staticmethod
     def list_supported_modes():
-        modes = ", ".join([fmt.NAME for fmt in VIS_MAP.values()])
+        modes = ", ".join(SUPPORTED_MODE_NAMES)
         print("Supported modes: {}".format(modes))
 
     @staticmethod
     def list_supported_audio_formats():
+        from soundfile import available_formats as available_audio_formats
+
+        from desstv.convert import AdditionalAudioFormatSupport
+
         additional_formats = [e.upper() for e in AdditionalAudioFormatSupport.formats()]
-        audio_formats = ", ".join(available_audio_formats().keys() + additional_formats)
+        audio_formats = ", ".join(list(available_audio_formats().keys()) + additional_formats)
         print("Supported audio formats: {}".format(audio_formats))
 
     @staticmethod
     def list_supported_image_formats():
-        Image.init()
-        image_formats = ", ".join(Image.SAVE.keys())
+        image_formats = ", ".join(get_supported_image_formats())
         print("Supported image formats: {}".format(image_formats))
@@ -1,6 +1,5 @@
 import os
-import tempfile
-from io import BufferedReader
+from io import BytesIO
 from typing import Callable, BinaryIO
 
 import pydub
@@ -8,21 +7,19 @@ import pydub
 from desstv import util
 
 
-def mp3_to_ogg(mp3_file_path: str) -> BufferedReader:
-    ogg_file_path = get_temp_ogg_file_path(mp3_file_path)
-    return pydub.AudioSegment.from_mp3(mp3_file_path).export(ogg_file_path, format="ogg")
+def mp3_to_wav(mp3_file_path: str) -> BytesIO:
+    """
+    Decodes MP3 into an in-memory WAV stream.
+    WAV is lossless PCM, so unlike converting to OGG, there is no lossy re-encoding
+    and no temporary file to write and read again.
+    """
 
-
-def get_temp_ogg_file_path(ori_file_path: str) -> str:
-    d = os.path.dirname(ori_file_path)
-    prefix = os.path.basename(ori_file_path)
-    suffix = ".ogg"
-    return tempfile.NamedTemporaryFile(dir=d, prefix=prefix, suffix=suffix, delete=True)
+    return pydub.AudioSegment.from_mp3(mp3_file_path).export(BytesIO(), format="wav")
 
 
 class AdditionalAudioFormatSupport(object):
-    supported: dict[str, Callable[[str], BufferedReader]] = {
-        "mp3": mp3_to_ogg,
+    supported: dict[str, Callable[[str], BinaryIO]] = {
+        "mp3": mp3_to_wav,
     }
 
     @staticmethod
@@ -33,8 +30,8 @@ class AdditionalAudioFormatSupport(object):
     @staticmethod
     def handle_audio_file(file_path: str) -> BinaryIO:
         """
-        If file is supported, convert it to OGG format and return the new ogg file path,
-        otherwise return the original file path.
+        If file is supported, convert it to an in-memory WAV stream and return the stream,
+        otherwise return the opened original file.
         Anyway the returned value is always acceptable for audio file processing library.
         """
 
@@ -42,10 +39,10 @@ class AdditionalAudioFormatSupport(object):
         file_suffix = file_name.split(".")[-1]
 
         if file_suffix in AdditionalAudioFormatSupport.supported:
-            util.log_info(f"Preprocessing [{file_name}]...", recur=True)
+            util.log_info("Preprocessing [%s]...", file_name, recur=True)
             handler = AdditionalAudioFormatSupport.supported[file_suffix]
-            ogg_file_stream = handler(file_path)
-            util.log_info(f"Preprocessing [{file_name}]... Done!")
-            return ogg_file_stream
+            wav_stream = handler(file_path)
+            util.log_info("Preprocessing [%s]... Done!", file_name)
+            return wav_stream
         else:
             return open(file_path, "rb")
@@ -1,14 +1,71 @@
 """Class and methods to decode SSTV signal"""
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import soundfile
-from PIL import Image
-from scipy.signal.windows import hann
+import scipy.fft
 
 from desstv import spec
 from desstv import util
 
 
+@lru_cache(maxsize=16)
+def _hann(size):
+    """Returns the Hann window of given size, cached since we only use a few distinct sizes"""
+
+    # scipy.signal is slow to import, only import it when decoding
+    from scipy.signal.windows import hann
+
+    window = hann(size).astype(np.float32)
+    # The same array is shared by every caller, don't let anyone modify it
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=16)
+def _tone_kernel(size, freq, sample_rate):
+    """
+    Returns the Hann windowed sinusoid used to measure one tone in sections of given size,
+    as a (size, 2) real array of its cosine and sine parts, so real audio data needn't be converted to complex.
+    """
+
+    phases = 2 * np.pi * freq * np.arange(size) / sample_rate
+    kernel = (_hann(size)[:, None] * np.stack([np.cos(phases), np.sin(phases)], axis=-1)).astype(np.float32)
+    kernel.flags.writeable = False
+    return kernel
+
+
+@lru_cache(maxsize=16)
+def _dft_bins_kernel(size, bin_count):
+    """Returns the Hann windowed DFT matrix computing the first bin_count bins of sections of given size"""
+
+    kernel = _hann(size)[:, None] * np.exp(-2j * np.pi * np.outer(np.arange(size), np.arange(bin_count)) / size)
+    kernel = kernel.astype(np.complex64)
+    kernel.flags.writeable = False
+    return kernel
+
+
+@lru_cache(maxsize=None)
+def _scan_times(mode, chan):
+    """
+    Returns the pixel time and the start times of all pixels (relative to the line start)
+    of a channel scan of the mode, cached as they're the same for every line.
+    """
+
+    pixel_time = mode.PIXEL_TIME
+    if mode.HAS_HALF_SCAN and chan > 0:
+        # Robot mode has half-length second/third scans
+        pixel_time = mode.HALF_PIXEL_TIME
+
+    px_times = mode.CHAN_OFFSETS[chan] + np.arange(mode.LINE_WIDTH) * pixel_time
+    px_times.flags.writeable = False
+    return pixel_time, px_times
+
+
 def calc_lum(freq):
     """Converts SSTV pixel frequency range (1500-2300hz) into 0-255 luminance value (color byte)"""
 
@@ -16,6 +73,24 @@ def calc_lum(freq):
     return min(max(lum, 0), 255)
 
 
+def calc_lums(freqs, out=None):
+    """
+    Array version of `calc_lum`, converts an array of pixel frequencies into luminance values.
+    Writes them into the uint8 array out if given, so there is no extra copy.
+    """
+
+    # Do all the steps in place on one temporary array, without any branch per pixel
+    lums = np.subtract(freqs, 1500)
+    lums /= 3.1372549
+    np.rint(lums, out=lums)
+    np.clip(lums, 0, 255, out=lums)
+
+    if out is None:
+        return lums.astype(np.uint8)
+    np.copyto(out, lums, casting="unsafe")
+    return out
+
+
 def barycentric_peak_interp(bins, x):
     """Interpolate between frequency bins to find peak frequency with Barycentric Interpolation method."""
 
@@ -32,22 +107,67 @@ def barycentric_peak_interp(bins, x):
     return ((right - left) / denom) + x
 
 
+def barycentric_peak_interp_rows(bins, x):
+    """Row-wise version of `barycentric_peak_interp`, takes a 2D array of bins and the peak index of each row."""
+
+    last = bins.shape[-1] - 1
+    left = np.take_along_axis(bins, np.maximum(x - 1, 0)[:, None], axis=-1)[:, 0]
+    centre = np.take_along_axis(bins, x[:, None], axis=-1)[:, 0]
+    right = np.take_along_axis(bins, np.minimum(x + 1, last)[:, None], axis=-1)[:, 0]
+
+    denom = left + centre + right
+    # Rows with zero denominator are erroneous, they result in 0 like the scalar version
+    safe_denom = np.where(denom == 0, 1, denom)
+    return np.where(denom == 0, 0, ((right - left) / safe_denom) + x)
+
+
 class SSTVDecoder(object):
     """Create an SSTV decoder for decoding audio data"""
 
     def __init__(self, audio_file):
+        """
+        :param audio_file: audio file to decode, or a (samples, sample_rate) tuple
+            of audio that was already loaded by a decoder (see `loaded_audio`)
+        """
+
         self.mode = None
-        self._audio_file = audio_file
 
-        # https://www.adobe.com/uk/creativecloud/video/discover/audio-sampling.html
-        soundfile_read: tuple[np.ndarray, int] = soundfile.read(self._audio_file)
-        self._samples, self._sample_rate = soundfile_read
+        if isinstance(audio_file, tuple):
+            self._audio_file = None
+            self._samples, self._sample_rate = audio_file
+        else:
+            self._audio_file = audio_file
+            self._samples, self._sample_rate = self._load_audio(audio_file)
 
-        # Convert to mono if stereo
-        # (If there is more than one channel in this audio file, convert all channels into one)
-        # https://splice.com/blog/multi-channel-audio-stereo-image/
-        if self._samples.ndim > 1:
-            self._samples = self._samples.mean(axis=1)
+    @staticmethod
+    def _load_audio(audio_file):
+        """Reads the audio file into mono samples for decoding"""
+
+        # https://www.adobe.com/uk/creativecloud/video/discover/audio-sampling.html
+        # Single precision is more than enough for SSTV signal, and it halves the memory traffic of decoding
+        with soundfile.SoundFile(audio_file) as audio:
+            sample_rate: int = audio.samplerate
+
+            if audio.channels == 1:
+                samples: np.ndarray = audio.read(dtype="float32")
+            else:
+                # Convert to mono if stereo
+                # (If there is more than one channel in this audio file, convert all channels into one)
+                # https://splice.com/blog/multi-channel-audio-stereo-image/
+                # Read it block by block, so we never hold all channels of the whole audio in memory.
+                samples = np.empty(audio.frames, dtype=np.float32)
+                position = 0
+                for block in audio.blocks(blocksize=spec.READ_BLOCK_SIZE, dtype="float32"):
+                    block.mean(axis=1, out=samples[position : position + len(block)])
+                    position += len(block)
+                samples = samples[:position]
+
+        return samples, sample_rate
+
+    def loaded_audio(self):
+        """Returns the (samples, sample_rate) tuple of loaded audio, it can be passed to a new decoder"""
+
+        return self._samples, self._sample_rate
 
     def __enter__(self):
         return self
@@ -98,12 +218,12 @@ class SSTVDecoder(object):
         # https://www.youtube.com/watch?v=pD7f6X9-_Kg
         #
         # Here we choose the Hann function as the window function.
-        windowed_data = data * hann(len(data))
+        windowed_data = data * _hann(len(data))
 
         # The FFT function helps extract the spectral characteristics
         # (the frequency-domain representation) of the data,
         # frequency is one of them.
-        fft = np.abs(np.fft.rfft(windowed_data))
+        fft = np.abs(scipy.fft.rfft(windowed_data))
 
         # Get index of bin with highest magnitude
         x = np.argmax(fft)
@@ -115,57 +235,119 @@ class SSTVDecoder(object):
         # Return frequency in hz
         return peak * bin_interval
 
+    def _peak_fft_freqs(self, frames):
+        """Finds the peak frequency of each row in a 2D array of equal-length audio sections"""
+
+        # Same as `_peak_fft_freq`, but runs one FFT call over all the sections at once
+        windowed_frames = frames * _hann(frames.shape[-1])
+        fft = np.abs(scipy.fft.rfft(windowed_frames, axis=-1))
+
+        x = np.argmax(fft, axis=-1)
+        peaks = barycentric_peak_interp_rows(fft, x)
+
+        bin_interval = self._sample_rate / frames.shape[-1]
+        return peaks * bin_interval
+
+    def _peak_band_freqs(self, frames, max_freq):
+        """
+        Finds the peak frequency of each row in a 2D array of equal-length audio sections,
+        only looking at the frequencies up to max_freq.
+        """
+
+        # Pixel sections are short, so they only have a few frequency bins at all,
+        # and we only care about the bins up to the highest pixel frequency.
+        # Computing just these bins with a (cached) DFT matrix is much cheaper than a full FFT.
+        size = frames.shape[-1]
+        bin_interval = self._sample_rate / size
+
+        # Interpolating moves a peak by less than one bin, so a peak at a higher bin than these
+        # always results in a frequency higher than max_freq.
+        # The bin after them is only used as the right neighbour for interpolating.
+        peak_bin_count = min(int(np.ceil(max_freq / bin_interval)) + 1, size // 2 + 1)
+        bin_count = min(peak_bin_count + 1, size // 2 + 1)
+
+        fft = np.abs(frames @ _dft_bins_kernel(size, bin_count))
+
+        x = np.argmax(fft[:, :peak_bin_count], axis=-1)
+        peaks = barycentric_peak_interp_rows(fft, x)
+
+        return peaks * bin_interval
+
+    def _tone_power_ratios(self, frames, freqs):
+        """
+        Finds how much of the power of audio sections is at the given frequencies.
+        The frames array has a shape of (tones, sections, section size),
+        sections of each tone are measured at the frequency of that tone in freqs.
+        """
+
+        # This is what the Goertzel algorithm computes: the power of one DFT bin,
+        # it costs a single dot product per section instead of a whole FFT.
+        size = frames.shape[-1]
+        window = _hann(size)
+        kernels = np.stack([_tone_kernel(size, freq, self._sample_rate) for freq in freqs])
+        tone_power = np.sum(np.matmul(frames, kernels) ** 2, axis=-1)
+
+        # By Parseval's theorem, the power of all bins on one side of the spectrum
+        # is half of the section size times its (windowed) energy.
+        total_power = (frames**2 @ window**2) * (size / 2)
+        return tone_power / np.where(total_power == 0, 1, total_power)
+
     def _find_header(self):
         """Finds the approx sample of the end of the calibration header"""
 
         window_size = round(spec.SEARCH_WINDOW_SIZE * self._sample_rate)
 
-        # Relative sample offsets of the header tones
+        # Relative sample offsets of the header tones and the frequency expected at each,
         # note that the search windows of parts aren't equal to the actual length of parts.
-        leader_1_offset = 0
-        leader_1_search_end = leader_1_offset + window_size
-
-        break_offset = round(spec.BREAK_OFFSET * self._sample_rate)
-        break_search_end = break_offset + window_size
-
-        leader_2_offset = round(spec.SECOND_LEADER_OFFSET * self._sample_rate)
-        leader_2_search_end = leader_2_offset + window_size
-
-        vis_start_offset = round(spec.VIS_START_BIT_OFFSET * self._sample_rate)
-        vis_start_search_end = vis_start_offset + window_size
+        tone_offsets = np.round(np.array(spec.HEADER_TONE_OFFSETS) * self._sample_rate).astype(np.intp)
+        tone_freqs = np.array(spec.HEADER_TONE_FREQS)
 
         # check(slide the checking window towards right) every 2ms
         jump_size = round(spec.JUMP_SIZE * self._sample_rate)
 
         header_size = round(spec.HDR_SIZE * self._sample_rate)
 
+        # Every search step (one window position per tone) starts at a multiple of jump_size
+        step_count = len(range(0, len(self._samples) - header_size, jump_size))
+
+        # Instead of sliding the windows one step at a time, we cut the audio into
+        # batches of steps and check all tones of a whole batch at once.
+        # A batch of 256 steps is about 0.5 seconds of audio,
+        # which is also how often the search progress message is updated.
+        batch_steps = 256
+
         # The margin of error created here will be negligible when decoding the
         # vis due to each bit having a length of 30ms. We fix this error margin
         # when decoding the image by aligning each sync pulse
-        for current_sample in range(0, len(self._samples) - header_size, jump_size):
+        for batch_start in range(0, step_count, batch_steps):
             # Update search progress message
-            # NOT_SURE Why multiple of 256? Don't know.
-            # It seems that the "progress" variable result in every 0.5 seconds.
-            if current_sample % (jump_size * 256) == 0:
-                progress = current_sample / self._sample_rate
-                util.log_info("Searching for calibration header... {:.1f}s".format(progress), recur=True)
-
-            search_end = current_sample + header_size
-            search_area = self._samples[current_sample:search_end]
-
-            leader_1_area = search_area[leader_1_offset:leader_1_search_end]
-            break_area = search_area[break_offset:break_search_end]
-            leader_2_area = search_area[leader_2_offset:leader_2_search_end]
-            vis_start_area = search_area[vis_start_offset:vis_start_search_end]
-
-            # Check they're the correct frequencies:
-            if (
-                abs(self._peak_fft_freq(leader_1_area) - 1900) < 50
-                and abs(self._peak_fft_freq(break_area) - 1200) < 50
-                and abs(self._peak_fft_freq(leader_2_area) - 1900) < 50
-                and abs(self._peak_fft_freq(vis_start_area) - 1200) < 50
-            ):
-                util.log_info("Searching for calibration header... Found!{:>4}".format(" "))
+            progress = batch_start * jump_size / self._sample_rate
+            util.log_info("Searching for calibration header... %.1fs", progress, recur=True)
+
+            batch_size = min(batch_steps, step_count - batch_start)
+            first_sample = batch_start * jump_size
+            last_sample = first_sample + (batch_size - 1) * jump_size
+
+            # The (tones, steps, window) array of every tone's window at every step of this batch
+            area = self._samples[first_sample : last_sample + tone_offsets[-1] + window_size]
+            step_offsets = np.arange(batch_size) * jump_size
+            frames = sliding_window_view(area, window_size)[tone_offsets[:, None] + step_offsets]
+
+            # Cheap pre-check: drop the steps which don't have a noticeable part of power at each tone,
+            # only the remaining steps are checked with the (more expensive) peak frequency detection.
+            tone_ratios = self._tone_power_ratios(frames, tone_freqs)
+            candidates = np.flatnonzero(np.all(tone_ratios > spec.TONE_POWER_THRESHOLD, axis=0))
+            if len(candidates) == 0:
+                continue
+
+            # Check they're the correct frequencies, all tones of all candidates with one FFT call
+            candidate_frames = frames[:, candidates].reshape(-1, window_size)
+            peak_freqs = self._peak_fft_freqs(candidate_frames).reshape(len(tone_freqs), -1)
+            matched = candidates[np.all(np.abs(peak_freqs - tone_freqs[:, None]) < 50, axis=0)]
+
+            if len(matched) > 0:
+                current_sample = first_sample + int(matched[0]) * jump_size
+                util.log_info("Searching for calibration header... Found!    ")
                 return current_sample + header_size
 
         util.log_error("Couldn't find SSTV header in the given audio file")
@@ -175,32 +357,30 @@ class SSTVDecoder(object):
         """Decodes the vis from the audio data and returns the SSTV mode"""
 
         bit_size = round(spec.VIS_BIT_SIZE * self._sample_rate)
-        vis_bits = []
+        if vis_start + 8 * bit_size > len(self._samples):
+            raise EOFError("Reached end of audio before image data")
 
-        for bit_idx in range(8):
-            bit_offset = vis_start + bit_idx * bit_size
-            section = self._samples[bit_offset : bit_offset + bit_size]
-            freq = self._peak_fft_freq(section)
-            # 1100 hz = 1, 1300hz = 0
-            vis_bits.append(int(freq <= 1200))
+        # One row per bit, decode all 8 bits with one FFT call
+        sections = self._samples[vis_start : vis_start + 8 * bit_size].reshape(8, bit_size)
+        freqs = self._peak_fft_freqs(sections)
+        # 1100 hz = 1, 1300hz = 0
+        vis_bits = freqs <= 1200
 
         # Check for even parity in last bit
-        parity = sum(vis_bits) % 2 == 0
+        parity = np.count_nonzero(vis_bits) % 2 == 0
         if not parity:
             raise ValueError("Error decoding VIS header (invalid parity bit)")
 
         # LSB (Least Significant Bit in CS, not Lower Sideband in signal modulation) first,
-        # so we must reverse and ignore the parity bit
-        vis_value = 0
-        for bit in vis_bits[-2::-1]:
-            vis_value = (vis_value << 1) | bit
+        # so we pack the bits in little bit order and ignore the parity bit
+        vis_value = int(np.packbits(vis_bits[:7], bitorder="little")[0])
 
         if vis_value not in spec.VIS_MAP:
             error = "SSTV mode is unsupported (VIS: {})"
             raise ValueError(error.format(vis_value))
 
         mode = spec.VIS_MAP[vis_value]
-        util.log_info("Detected SSTV mode [{}]".format(mode.NAME))
+        util.log_info("Detected SSTV mode [%s]", mode.NAME)
 
         return mode
 
@@ -216,13 +396,23 @@ class SSTVDecoder(object):
         if align_stop <= align_start:
             return None  # Reached end of audio
 
-        for current_sample in range(align_start, align_stop):
-            section_end = current_sample + sync_window
-            search_section = self._samples[current_sample:section_end]
-
-            if self._peak_fft_freq(search_section) > 1350:
+        # Check the sections starting at every sample, in batches so that we can stop early.
+        # The sync pulse is usually found soon, so start with a small batch and grow it.
+        current_sample = align_stop - 1
+        batch_start = align_start
+        batch_size = 64
+        while batch_start < align_stop:
+            batch_stop = min(batch_start + batch_size, align_stop)
+            sections = sliding_window_view(self._samples[batch_start : batch_stop - 1 + sync_window], sync_window)
+
+            found = np.flatnonzero(self._peak_fft_freqs(sections) > 1350)
+            if len(found) > 0:
+                current_sample = batch_start + int(found[0])
                 break
 
+            batch_start = batch_stop
+            batch_size = min(batch_size * 2, 4096)
+
         end_sync = current_sample + (sync_window // 2)
 
         if start_of_sync:
@@ -233,17 +423,12 @@ class SSTVDecoder(object):
     def _decode_image_data(self, image_start):
         """Decodes image from the transmission section of a desstv signal"""
 
-        # NOT_SURE How the WINDOW_FACTOR is determined for decoding pixels?
-        window_factor = self.mode.WINDOW_FACTOR
-        centre_window_time = (self.mode.PIXEL_TIME * window_factor) / 2
-        pixel_window = round(self.mode.PIXEL_TIME * window_factor * self._sample_rate)
-
         height = self.mode.LINE_COUNT
         channels = self.mode.CHAN_COUNT
         width = self.mode.LINE_WIDTH
 
-        # Use list comprehension to init list so we can return data early
-        image_data = [[[0 for i in range(width)] for j in range(channels)] for k in range(height)]
+        # Init with zeros so we can return data early
+        image_data = np.zeros((height, channels, width), dtype=np.uint8)
 
         seq_start = image_start
 
@@ -253,6 +438,11 @@ class SSTVDecoder(object):
             if seq_start is None:
                 raise EOFError("Reached end of audio before image data")
 
+        # First pass: find where each channel scan starts by aligning to the sync pulses.
+        # It must be sequential since each sync pulse is searched from the previous one,
+        # but it's cheap compared to decoding the pixels.
+        # -1 marks the scans after the end of audio.
+        scan_starts = np.full((height, channels), -1, dtype=np.intp)
         for line in range(height):
             if self.mode.CHAN_SYNC > 0 and line == 0:
                 # Align seq_start to the beginning of the previous sync pulse
@@ -268,41 +458,79 @@ class SSTVDecoder(object):
                     # Align to start of sync pulse
                     seq_start = self._align_sync(seq_start)
                     if seq_start is None:
-                        util.log_warn("Reached end of audio whilst decoding, the image will be incomplete")
-                        return image_data
+                        break
 
-                pixel_time = self.mode.PIXEL_TIME
-                if self.mode.HAS_HALF_SCAN:
-                    # Robot mode has half-length second/third scans
-                    if chan > 0:
-                        pixel_time = self.mode.HALF_PIXEL_TIME
+                scan_starts[line, chan] = seq_start
 
-                    centre_window_time = (pixel_time * window_factor) / 2
-                    pixel_window = round(centre_window_time * 2 * self._sample_rate)
+            if seq_start is None:
+                break
 
-                for px in range(width):
-                    chan_offset = self.mode.CHAN_OFFSETS[chan]
+        # Second pass: with the scan starts known, lines are independent of each other,
+        # so decode them in parallel. Threads are enough since the heavy work is done by NumPy,
+        # which releases the GIL.
+        def decode_line(line):
+            return [
+                self._decode_scan(image_data, line, chan, scan_starts[line, chan])
+                for chan in range(channels)
+                if scan_starts[line, chan] >= 0
+            ]
+
+        executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        with executor:
+            for line, decoded_sizes in enumerate(executor.map(decode_line, range(height))):
+                if len(decoded_sizes) < channels or decoded_sizes[-1] < width:
+                    # Reached end of audio whilst decoding this line,
+                    # later lines have nothing to decode, don't wait for them.
+                    executor.shutdown(cancel_futures=True)
+                    break
+
+                if util.progress_bar.enabled:
+                    util.progress_bar(line, height - 1, "Decoding image...")
+            else:
+                return image_data
+
+        # Like decoding line by line, leave everything after the first incomplete scan empty,
+        # the incomplete scan is either partly decoded, or missing when its sync pulse wasn't found
+        decoded_chans = next(
+            (chan + 1 for chan, size in enumerate(decoded_sizes) if size < width), len(decoded_sizes)
+        )
+        image_data[line, decoded_chans:] = 0
+        image_data[line + 1 :] = 0
+        util.log_warn("Reached end of audio whilst decoding, the image will be incomplete")
+        return image_data
 
-                    px_pos = round(seq_start + (chan_offset + px * pixel_time - centre_window_time) * self._sample_rate)
-                    px_end = px_pos + pixel_window
+    def _decode_scan(self, image_data, line, chan, seq_start):
+        """
+        Decodes the pixels of one channel scan into image_data,
+        returns how many pixels are decoded before reaching end of audio.
+        """
+
+        # NOT_SURE How the WINDOW_FACTOR is determined for decoding pixels?
+        window_factor = self.mode.WINDOW_FACTOR
 
-                    # If we are performing fft past audio length, stop early
-                    if px_end >= len(self._samples):
-                        util.log_warn("Reached end of audio whilst decoding, the image will be incomplete")
-                        return image_data
+        pixel_time, px_times = _scan_times(self.mode, chan)
+        centre_window_time = (pixel_time * window_factor) / 2
+        pixel_window = round(centre_window_time * 2 * self._sample_rate)
 
-                    pixel_area = self._samples[px_pos:px_end]
-                    freq = self._peak_fft_freq(pixel_area)
+        # Sample positions of all pixel windows of this channel
+        px_positions = np.round(seq_start + (px_times - centre_window_time) * self._sample_rate)
+        px_positions = px_positions.astype(np.intp)
 
-                    image_data[line][chan][px] = calc_lum(freq)
+        # If we are performing fft past audio length, only decode pixels before the end
+        decodable = np.count_nonzero(px_positions + pixel_window < len(self._samples))
 
-            util.progress_bar(line, height - 1, "Decoding image...")
+        # Run one FFT call over all pixel windows of this channel
+        pixel_areas = sliding_window_view(self._samples, pixel_window)[px_positions[:decodable]]
+        freqs = self._peak_band_freqs(pixel_areas, 2300)
 
-        return image_data
+        calc_lums(freqs, out=image_data[line, chan, :decodable])
+        return decodable
 
     def _draw_image(self, image_data):
         """Renders the image from the decoded desstv signal"""
 
+        from PIL import Image
+
         # Let PIL do YUV-RGB conversion for us
         if self.mode.COLOR == spec.COL_FMT.YUV:
             col_mode = "YCbCr"
@@ -313,35 +541,34 @@ class SSTVDecoder(object):
         height = self.mode.LINE_COUNT
         channels = self.mode.CHAN_COUNT
 
-        image = Image.new(col_mode, (width, height))
-        pixel_data = image.load()
-
         util.log_info("Drawing image data...", recur=True)
 
-        for y in range(height):
-            odd_line = y % 2
-            for x in range(width):
-                if channels == 2:
-                    if self.mode.HAS_ALT_SCAN:
-                        if self.mode.COLOR == spec.COL_FMT.YUV:
-                            # R36
-                            pixel = (
-                                image_data[y][0][x],
-                                image_data[y - (odd_line - 1)][1][x],
-                                image_data[y - odd_line][1][x],
-                            )
-
-                elif channels == 3:
-                    if self.mode.COLOR == spec.COL_FMT.GBR:
-                        # M1, M2, S1, S2, SDX
-                        pixel = (image_data[y][2][x], image_data[y][0][x], image_data[y][1][x])
-                    elif self.mode.COLOR == spec.COL_FMT.YUV:
-                        # R72
-                        pixel = (image_data[y][0][x], image_data[y][2][x], image_data[y][1][x])
-                    elif self.mode.COLOR == spec.COL_FMT.RGB:
-                        pixel = (image_data[y][0][x], image_data[y][1][x], image_data[y][2][x])
-
-                pixel_data[x, y] = pixel
+        # Rearrange the (line, channel, pixel) data into the (y, x, channel) layout of the image
+        pixels = np.empty((height, width, 3), dtype=np.uint8)
+
+        if channels == 2:
+            if self.mode.HAS_ALT_SCAN:
+                if self.mode.COLOR == spec.COL_FMT.YUV:
+                    # R36
+                    # Even lines carry one chrominance channel and odd lines carry the other,
+                    # so each pair of lines shares the two chrominance scans.
+                    pixels[:, :, 0] = image_data[:, 0]
+                    pixels[0::2, :, 1] = image_data[1::2, 1]
+                    pixels[1::2, :, 1] = image_data[1::2, 1]
+                    pixels[0::2, :, 2] = image_data[0::2, 1]
+                    pixels[1::2, :, 2] = image_data[0::2, 1]
+
+        elif channels == 3:
+            if self.mode.COLOR == spec.COL_FMT.GBR:
+                # M1, M2, S1, S2, SDX
+                pixels[:] = image_data[:, [2, 0, 1]].transpose(0, 2, 1)
+            elif self.mode.COLOR == spec.COL_FMT.YUV:
+                # R72
+                pixels[:] = image_data[:, [0, 2, 1]].transpose(0, 2, 1)
+            elif self.mode.COLOR == spec.COL_FMT.RGB:
+                pixels[:] = image_data.transpose(0, 2, 1)
+
+        image = Image.frombytes(col_mode, (width, height), pixels.tobytes())
 
         if image.mode != "RGB":
             image = image.convert("RGB")
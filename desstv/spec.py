@@ -125,7 +125,7 @@ class SDX(Scottie):
 
 
 def scottie_additional(cls: Type[Scottie]):
-    cls.CHAN_TIME = Scottie.SEP_PULSE + Scottie.SCAN_TIME
+    cls.CHAN_TIME = Scottie.SEP_PULSE + cls.SCAN_TIME
 
     cls.CHAN_OFFSETS = [Scottie.SYNC_PULSE + Scottie.SYNC_PORCH + cls.CHAN_TIME]
     cls.CHAN_OFFSETS.append(cls.CHAN_OFFSETS[0] + cls.CHAN_TIME)
@@ -187,6 +187,7 @@ class R72(RobotColor):
     NAME = "Robot 72 Color"
 
     LINE_WIDTH = 320
+    LINE_COUNT = 240
     SCAN_TIME = 0.138000
     HALF_SCAN_TIME = SCAN_TIME / 2
 
@@ -207,6 +208,7 @@ class R72(RobotColor):
 
 
 VIS_MAP = {8: R36, 12: R72, 40: M2, 44: M1, 56: S2, 60: S1, 76: SDX}
+SUPPORTED_MODE_NAMES = tuple(mode.NAME for mode in VIS_MAP.values())
 
 # The calibration header with VIS(Vertical Interval Signaling) code
 # (code that tells which mode this audio used)
@@ -226,12 +228,24 @@ VIS_BIT_SIZE = 0.030
 # These OFFSET variables' values describe the start time point of each part
 BREAK_OFFSET = LEADER_TONE_SIZE
 SECOND_LEADER_OFFSET = BREAK_OFFSET + BREAK_SIZE
-VIS_START_BIT_OFFSET = BREAK_OFFSET + SECOND_LEADER_OFFSET
+VIS_START_BIT_OFFSET = SECOND_LEADER_OFFSET + LEADER_TONE_SIZE
+
+# The start time point and frequency of each part we check for finding the header,
+# kept as two parallel tuples so they can be turned into arrays and checked all at once.
+HEADER_TONE_OFFSETS = (0.0, BREAK_OFFSET, SECOND_LEADER_OFFSET, VIS_START_BIT_OFFSET)
+HEADER_TONE_FREQS = (1900, 1200, 1900, 1200)
 
 # To be correct, the "VIS start bit" should not be included in the "header",
 # we include it here for convenience
 HDR_SIZE = VIS_START_BIT_OFFSET + VIS_BIT_SIZE
 
+# How many frames of multichannel audio are read (and converted to mono) at once
+READ_BLOCK_SIZE = 65536
+
 # Our custom frequency checking window size and skip size for finding the header
 SEARCH_WINDOW_SIZE = 0.010
 JUMP_SIZE = 0.002
+# The minimum part of a checking window's power at the expected frequency,
+# for the window to be checked further. A clean tone has about 0.5-0.67,
+# while noise or the mixed frequencies of image data usually have much lower.
+TONE_POWER_THRESHOLD = 0.05
@@ -1,53 +1,250 @@
 """Shared methods"""
+import atexit
+import logging
 import os
+import signal
 import sys
+import time
 
+_ERROR_PREFIX = "[desstv] ERROR | "
+_WARN_PREFIX = "[desstv] WARN  | "
+_INFO_PREFIX = "[desstv] INFO  | "
+_PREFIXES = {logging.ERROR: _ERROR_PREFIX, logging.WARNING: _WARN_PREFIX, logging.INFO: _INFO_PREFIX}
 
-def log_error(message):
-    print(f"[desstv] ERROR | {message}", file=sys.stderr)
+_IS_WIN32 = sys.platform == "win32"
+_WIN32_RECUR_PREFIX = "\r" + _INFO_PREFIX
+_PREFIX_LEN = len(_INFO_PREFIX) + 1
+_SHORT_MESSAGE_LEN = 40
 
+# Recurring log lines (progress frames) are buffered and written in batches,
+# the buffer is flushed when it's large or old enough, and before any normal log line.
+# A frame following a normal line, or nothing written for a while, is written at once,
+# only the frames quickly following it are batched.
+_STDERR_BUF_SIZE = 8192
+_STDERR_BUF_TIME = 0.05  # seconds
+_stderr_buf = []
+_stderr_buf_len = 0
+_stderr_flushed_at = 0.0
+_stderr_line_ended = True
 
-def log_warn(message=""):
-    print(f"[desstv] WARN  | {message}", file=sys.stderr)
 
+def _flush_stderr():
+    global _stderr_buf_len, _stderr_flushed_at
 
-def log_info(message="", recur=False):
+    _stderr_flushed_at = time.monotonic()
+    if not _stderr_buf:
+        return
+
+    # Write the encoded bytes to the underlying binary buffer, skipping the text layer,
+    # streams without one (e.g. StringIO in tests) are written as text.
+    stream = sys.stderr
+    text = "".join(_stderr_buf)
+    binary = getattr(stream, "buffer", None)
+    if binary is not None:
+        binary.write(text.encode(stream.encoding or "utf-8", errors="replace"))
+        binary.flush()
+    else:
+        stream.write(text)
+        stream.flush()
+    _stderr_buf.clear()
+    _stderr_buf_len = 0
+
+
+def _write_stderr(text, recur):
+    global _stderr_buf_len, _stderr_line_ended
+
+    first_frame = _stderr_line_ended
+    _stderr_line_ended = not recur
+    _stderr_buf.append(text)
+    _stderr_buf_len += len(text)
+    if (
+        not recur
+        or first_frame
+        or _stderr_buf_len > _STDERR_BUF_SIZE
+        or time.monotonic() - _stderr_flushed_at > _STDERR_BUF_TIME
+    ):
+        _flush_stderr()
+
+
+atexit.register(_flush_stderr)
+
+# The terminal width is cached, on POSIX it's invalidated when the terminal is resized (SIGWINCH),
+# elsewhere it's queried again once it's older than _COLS_TTL.
+_HAS_SIGWINCH = hasattr(signal, "SIGWINCH")
+_COLS_TTL = 0.2  # seconds
+_cols = None
+_cols_queried_at = 0.0
+
+
+def _invalidate_cols(*_):
+    global _cols
+    _cols = None
+
+
+def _get_cols():
+    global _cols, _cols_queried_at
+
+    if _cols is None or (not _HAS_SIGWINCH and time.monotonic() - _cols_queried_at > _COLS_TTL):
+        _cols = os.get_terminal_size().columns
+        _cols_queried_at = time.monotonic()
+    return _cols
+
+
+if _HAS_SIGWINCH:
+    try:
+        signal.signal(signal.SIGWINCH, _invalidate_cols)
+    except ValueError:
+        # Not imported from the main thread, signal handlers can't be set
+        _HAS_SIGWINCH = False
+
+
+class _StderrHandler(logging.Handler):
+    """
+    Writes log records with the constant prefix of their level to the current sys.stderr
+    (which may be replaced after import), records logged with the "recur" extra
+    end with carriage return instead of newline, and are buffered.
+    """
+
+    def emit(self, record):
+        try:
+            recur = getattr(record, "recur", False)
+            text = _PREFIXES[record.levelno] + record.getMessage() + ("\r" if recur else "\n")
+            _write_stderr(text, recur)
+        except Exception:
+            self.handleError(record)
+
+
+_LEVELS = {"ERROR": logging.ERROR, "WARN": logging.WARNING, "WARNING": logging.WARNING, "INFO": logging.INFO}
+
+
+def _parse_level(value):
+    """Level of a level name ("ERROR", "WARN", "INFO") or number, INFO if it's neither"""
+
+    value = value.strip().upper()
+    if value in _LEVELS:
+        return _LEVELS[value]
+    try:
+        return int(value)
+    except ValueError:
+        return logging.INFO
+
+
+# Logs below this level are dropped, set by DESSTV_LEVEL environment variable
+_min_level = _parse_level(os.environ.get("DESSTV_LEVEL", "INFO"))
+
+_logger = logging.getLogger("desstv")
+_logger.setLevel(_min_level)
+_logger.propagate = False
+_logger.addHandler(_StderrHandler())
+
+
+def _log(level, message, args, recur=False):
+    """Arguments are %-formatted into message only when the level is enabled"""
+
+    if level < _min_level:
+        return
+    _logger.log(level, message, *args, extra={"recur": recur})
+
+
+def log_error(message, *args):
+    _log(logging.ERROR, message, args)
+
+
+def log_warn(message="", *args):
+    _log(logging.WARNING, message, args)
+
+
+def log_info(message="", *args, recur=False):
     """recur param for letting next line of log override current one."""
-    end = "\n"
-    if recur:
-        end = "\r"
-        if sys.platform == "win32":
-            message = "".join(["\r[desstv] INFO  | ", message])
-        cols = os.get_terminal_size().columns
+
+    if not recur:
+        _log(logging.INFO, message, args)
+        return
+
+    if logging.INFO < _min_level:
+        return
+
+    # The message must be formatted here for fitting it in the terminal width
+    if args:
+        message = message % args
+    if _IS_WIN32:
+        message = _WIN32_RECUR_PREFIX + message
+    # Any reasonable terminal fits a short message, don't bother checking its width
+    if len(message) > _SHORT_MESSAGE_LEN:
+        cols = _get_cols()
         if cols < len(message):
             message = message[:cols]
 
-    print(f"[desstv] INFO  | {message}", file=sys.stderr, end=end)
+    _log(logging.INFO, message, (), recur=True)
+
+
+# The bar is at most 100 chars, it's drawn from a fixed buffer which is changed in place,
+# only the chars between the last and the current fill size are changed for every frame.
+_FULL_BAR = memoryview(b"#" * 128)
+_EMPTY_BAR = memoryview(b"." * 128)
+_bar = bytearray(_EMPTY_BAR)
+_bar_view = memoryview(_bar)
+_bar_fill = 0
+
+# Progress bar is drawn at most 30 times per second
+_FRAME_INTERVAL_NS = 33_000_000
+_last_frame_ns = 0
+_last_frame = None
 
 
 def progress_bar(progress, complete, message="", show=True):
-    """Dynamic refreshing loading bar"""
+    """
+    Dynamic refreshing loading bar.
+    Check progress_bar.enabled before building an expensive message at call site:
+    if util.progress_bar.enabled:
+        util.progress_bar(i, n, f"Decoding {name}...")
+    """
 
-    if not show:
+    if not show or not progress_bar.enabled or logging.INFO < _min_level:
         return
 
-    message_size = len(message) + 18  # prefix size of "[desstv] INFO  | "
-    cols = os.get_terminal_size().columns
-    percent_on = True
-    level = progress / complete
+    # Don't draw faster than the terminal can show, but always draw the last frame
+    global _last_frame_ns, _last_frame
+    now = time.monotonic_ns()
+    not_end = progress != complete
+    if not_end and now - _last_frame_ns < _FRAME_INTERVAL_NS:
+        return
+
+    message_size = len(message) + _PREFIX_LEN
+    cols = _get_cols()
     bar_size = min(cols - message_size - 10, 100)
-    bar = ""
+    # Integer math only, the fill size is rounded to the nearest char and the percent is floored
+    fill_size = (2 * bar_size * progress + complete) // (2 * complete) if bar_size > 5 else 0
+    percent_level = (progress * 100) // complete if bar_size >= -3 else None
+
+    # Nothing to redraw if this frame looks the same as the last one
+    frame = (message, cols, fill_size, percent_level)
+    if not_end and frame == _last_frame:
+        return
+    _last_frame_ns = now
+    _last_frame = frame
 
+    global _bar_fill
+    bar = ""
     if bar_size > 5:
-        fill_size = round(bar_size * level)
-        bar = "[{}]".format("".join(["#" * fill_size, "." * (bar_size - fill_size)]))
-    elif bar_size < -3:
-        percent_on = False
+        if fill_size > _bar_fill:
+            _bar[_bar_fill:fill_size] = _FULL_BAR[_bar_fill:fill_size]
+        elif fill_size < _bar_fill:
+            _bar[fill_size:_bar_fill] = _EMPTY_BAR[fill_size:_bar_fill]
+        _bar_fill = fill_size
+        bar = f"[{str(_bar_view[:bar_size], 'ascii')}]"
 
     percent = ""
-    if percent_on:
-        percent = "{:4d}%".format(int(level * 100))
+    if percent_level is not None:
+        percent = f"{percent_level:4d}%"
 
     align = cols - message_size - len(percent)
-    not_end = progress != complete
-    log_info("{}{:>{width}}{}".format(message, bar, percent, width=align), recur=not_end)
+    log_info(f"{message}{bar:>{align}}{percent}", recur=not_end)
+
+
+progress_bar.enabled = True
+
+
+def set_progress_enabled(enabled):
+    """Turns all progress bars on or off"""
+    progress_bar.enabled = bool(enabled)
@@ -0,0 +1,121 @@
+"""Test cases for the loaded audio cache"""
+
+import os
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+
+from desstv import cache
+
+
+class CacheTestCase(unittest.TestCase):
+    """Test saving and loading cached audio samples"""
+
+    def setUp(self):
+        """Point the cache to a temporary directory, with a fake audio file in another one"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+        cache_dir_patch = mock.patch.object(cache, "CACHE_DIR", self.cache_dir)
+        cache_dir_patch.start()
+        self.addCleanup(cache_dir_patch.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.audio_file = self.make_audio_file("audio.wav")
+        self.samples = np.linspace(-1, 1, 1000, dtype=np.float32)
+
+    def make_audio_file(self, name):
+        """The cache only looks at the audio file's path and stat"""
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "wb") as fp:
+            fp.write(b"audio data")
+        return path
+
+    def cache_file_names(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_load_without_cache(self):
+        """Test loading audio which is never cached"""
+        self.assertIsNone(cache.load_samples(self.audio_file))
+
+    def test_save_and_load(self):
+        """Test loading cached audio gives the saved samples"""
+        cache.save_samples(self.audio_file, self.samples, 16000)
+        samples, sample_rate = cache.load_samples(self.audio_file)
+        self.assertEqual(sample_rate, 16000)
+        self.assertEqual(samples.dtype, np.float32)
+        np.testing.assert_array_equal(samples, self.samples)
+
+    def test_load_outdated_by_mtime(self):
+        """Test cache is ignored when the audio file is modified"""
+        cache.save_samples(self.audio_file, self.samples, 16000)
+        stat = os.stat(self.audio_file)
+        os.utime(self.audio_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(cache.load_samples(self.audio_file))
+
+    def test_load_outdated_by_size(self):
+        """Test cache is ignored when the audio file's size changes"""
+        cache.save_samples(self.audio_file, self.samples, 16000)
+        stat = os.stat(self.audio_file)
+        with open(self.audio_file, "ab") as fp:
+            fp.write(b"more audio data")
+        # Keep the modification time, only the size tells it's changed
+        os.utime(self.audio_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIsNone(cache.load_samples(self.audio_file))
+
+    def test_load_outdated_by_version(self):
+        """Test cache saved by another cache version is ignored"""
+        cache.save_samples(self.audio_file, self.samples, 16000)
+        with mock.patch.object(cache, "CACHE_VERSION", cache.CACHE_VERSION + 1):
+            self.assertIsNone(cache.load_samples(self.audio_file))
+
+    def test_load_broken_cache_file(self):
+        """Test broken cache file is ignored"""
+        cache.save_samples(self.audio_file, self.samples, 16000)
+        with open(cache.get_cache_file_path(self.audio_file), "wb") as fp:
+            fp.write(b"not a npz file")
+        self.assertIsNone(cache.load_samples(self.audio_file))
+
+    def test_save_replaces_cache_file(self):
+        """Test saving again replaces the cache file, leaving no temporary files"""
+        cache.save_samples(self.audio_file, self.samples, 16000)
+        cache.save_samples(self.audio_file, self.samples * 2, 16000)
+        np.testing.assert_array_equal(cache.load_samples(self.audio_file)[0], self.samples * 2)
+        self.assertEqual(self.cache_file_names(), [os.path.basename(cache.get_cache_file_path(self.audio_file))])
+
+    def test_failed_save_keeps_cache_file(self):
+        """Test failing to write the cache keeps the previous cache file, and removes the temporary file"""
+        cache.save_samples(self.audio_file, self.samples, 16000)
+
+        sys.stderr = StringIO()
+        try:
+            with mock.patch.object(cache.np, "savez", side_effect=OSError("No space left on device")):
+                cache.save_samples(self.audio_file, self.samples * 2, 16000)
+            self.assertIn("Failed to cache loaded audio", sys.stderr.getvalue())
+        finally:
+            sys.stderr = sys.__stderr__
+
+        np.testing.assert_array_equal(cache.load_samples(self.audio_file)[0], self.samples)
+        self.assertEqual(len(self.cache_file_names()), 1)
+
+    def test_remove_old_cache_files(self):
+        """Test only the most recently used cache files are kept"""
+        audio_files = [self.make_audio_file(f"audio{i}.wav") for i in range(cache.MAX_CACHE_FILES + 2)]
+        with mock.patch.object(cache, "MAX_CACHE_FILES", len(audio_files)):
+            for audio_file in audio_files:
+                cache.save_samples(audio_file, self.samples, 16000)
+        self.assertEqual(len(self.cache_file_names()), len(audio_files))
+
+        # Make the order of modification times certain
+        for i, audio_file in enumerate(audio_files):
+            os.utime(cache.get_cache_file_path(audio_file), ns=(i * 1_000_000_000, i * 1_000_000_000))
+
+        # Using the first one makes it the most recent one
+        self.assertIsNotNone(cache.load_samples(audio_files[0]))
+        cache.remove_old_cache_files()
+
+        kept = [audio_file for audio_file in audio_files if os.path.exists(cache.get_cache_file_path(audio_file))]
+        self.assertEqual(kept, [audio_files[0]] + audio_files[3:])
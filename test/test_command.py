@@ -24,7 +24,7 @@ class SSTVCommandTestCase(unittest.TestCase):
         """Test --list-modes flag outputs correctly"""
         with self.assertRaises(SystemExit):
             SSTVCommand(["--list-modes"])
-        modes = "Supported modes: Robot 36, Robot 72, Martin 2, Martin 1, Scottie 2, Scottie 1, Scottie DX"
+        modes = "Supported modes: Robot 36 Color, Robot 72 Color, Martin 2, Martin 1, Scottie 2, Scottie 1, Scottie DX"
         self.assertEqual(sys.stdout.getvalue().strip(), modes, "List of modes not equal")
 
     def test_arg_parser_decode_error(self):
@@ -64,3 +64,9 @@ class SSTVCommandTestCase(unittest.TestCase):
         args = SSTVCommand(["-d", "./test/data/m1.ogg", "-s", "15.50"]).args
         self.assertTrue(hasattr(args, "skip"), "skip attribute not set")
         self.assertEqual(args.skip, 15.5, "skip value not set correctly")
+
+    def test_arg_parser_no_cache(self):
+        """Test the cache is used by default, and turned off by the no-cache flag"""
+        self.assertTrue(SSTVCommand(["-d", "./test/data/m1.ogg"]).args.use_cache, "Cache not used by default")
+        args = SSTVCommand(["-d", "./test/data/m1.ogg", "--no-cache"]).args
+        self.assertFalse(args.use_cache, "Cache not turned off")
@@ -2,7 +2,11 @@
 
 import unittest
 
-from desstv.decode import barycentric_peak_interp, calc_lum, SSTVDecoder
+import numpy as np
+from PIL import Image
+
+from desstv import spec, util
+from desstv.decode import barycentric_peak_interp, barycentric_peak_interp_rows, calc_lum, calc_lums, SSTVDecoder
 
 
 class SSTVDecoderTestCase(unittest.TestCase):
@@ -14,6 +18,15 @@ class SSTVDecoderTestCase(unittest.TestCase):
         self.assertEqual(calc_lum(2350), 255)
         self.assertEqual(calc_lum(1758.1531), 82)
 
+    def test_calc_lums(self):
+        """Test array version of the function that calculates pixel bytes from frequencies"""
+        freqs = np.array([1450, 2350, 1758.1531, 1500, 2300])
+        self.assertEqual(calc_lums(freqs).tolist(), [calc_lum(freq) for freq in freqs])
+
+        out = np.zeros(len(freqs), dtype=np.uint8)
+        calc_lums(freqs, out=out)
+        self.assertEqual(out.tolist(), [calc_lum(freq) for freq in freqs])
+
     def test_barycentric_peak_interp(self):
         """Test function to interpolate the x value from frequency bins"""
         bins = [100, 50, 0, 25, 50, 75, 100, 200, 150, 100]
@@ -28,6 +41,13 @@ class SSTVDecoderTestCase(unittest.TestCase):
         # Centre 2 surrounded by 2s should result in no change
         self.assertEqual(barycentric_peak_interp(bins, 2), 2)
 
+    def test_barycentric_peak_interp_rows(self):
+        """Test row-wise interpolation gives the same results as the scalar function"""
+        bins = np.array([[100, 50, 0, 25, 50, 75, 100, 200, 150, 100], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]] * 3)
+        x = np.array([9, 0, 0, 3, 7, 5])
+        expected = [barycentric_peak_interp(row, i) for row, i in zip(bins, x)]
+        self.assertEqual(barycentric_peak_interp_rows(bins, x).tolist(), expected)
+
     def test_decoder_init(self):
         """Test SSTVDecoder init"""
         with open("./test/data/m1.ogg", "rb") as fp:
@@ -35,6 +55,17 @@ class SSTVDecoderTestCase(unittest.TestCase):
                 self.assertEqual(decoder._audio_file, fp)
                 self.assertEqual(decoder._sample_rate, 44100)
 
+    def test_decoder_init_with_loaded_audio(self):
+        """Test SSTVDecoder init with audio loaded by another decoder"""
+        with open("./test/data/m1.ogg", "rb") as fp:
+            with SSTVDecoder(fp) as decoder:
+                loaded_audio = decoder.loaded_audio()
+
+        with SSTVDecoder(loaded_audio) as decoder:
+            self.assertIsNone(decoder._audio_file)
+            self.assertIs(decoder._samples, loaded_audio[0])
+            self.assertEqual(decoder._sample_rate, loaded_audio[1])
+
     def test_decoder_freq_detect(self):
         """Test the peak frequency detection function"""
         with open("./test/data/220hz_sine.ogg", "rb") as fp:
@@ -44,9 +75,131 @@ class SSTVDecoderTestCase(unittest.TestCase):
                 self.assertEqual(freq, 220, "Incorrect frequency determined by peak detector using all samples")
 
                 # Test using 1/4 of a second of samples
-                freq = round(decoder._peak_fft_freq(decoder._samples[:11025]))
+                freq = round(decoder._peak_fft_freq(decoder._samples[: decoder._sample_rate // 4]))
                 self.assertEqual(freq, 220, "Incorrect frequency determined by peak detector using 1/4 second samples")
 
-                # Test using 2000 samples
-                freq = round(decoder._peak_fft_freq(decoder._samples[:1000]))
-                self.assertEqual(freq, 220, "Incorrect frequency determined by peak detector using 1000 samples")
+                # Test using 1/44 of a second of samples
+                freq = round(decoder._peak_fft_freq(decoder._samples[: decoder._sample_rate // 44]))
+                self.assertEqual(freq, 220, "Incorrect frequency determined by peak detector using 1/44 second samples")
+
+    def test_decoder_batched_freq_detect(self):
+        """Test the batched peak frequency detection function"""
+        with open("./test/data/220hz_sine.ogg", "rb") as fp:
+            with SSTVDecoder(fp) as decoder:
+                frames = decoder._samples[: decoder._sample_rate // 44 * 4].reshape(4, -1)
+                freqs = np.round(decoder._peak_fft_freqs(frames))
+                self.assertEqual(freqs.tolist(), [220] * 4, "Incorrect frequencies determined by batched peak detector")
+
+    def test_decoder_tone_power_ratios(self):
+        """Test the single tone power detection function"""
+        with open("./test/data/220hz_sine.ogg", "rb") as fp:
+            with SSTVDecoder(fp) as decoder:
+                frames = decoder._samples[: decoder._sample_rate // 44 * 4].reshape(4, -1)
+                ratios = decoder._tone_power_ratios(np.stack([frames, frames]), [220, 1200])
+                self.assertTrue(np.all(ratios[0] > 0.4), "Tone power not detected")
+                self.assertTrue(np.all(ratios[1] < 0.05), "Wrong tone power detected")
+
+    def test_decoder_band_freq_detect(self):
+        """Test the band-limited batched peak frequency detection function"""
+        with open("./test/data/220hz_sine.ogg", "rb") as fp:
+            with SSTVDecoder(fp) as decoder:
+                frames = decoder._samples[: decoder._sample_rate // 44 * 4].reshape(4, -1)
+                freqs = np.round(decoder._peak_band_freqs(frames, 2300))
+                self.assertEqual(freqs.tolist(), [220] * 4, "Incorrect frequencies determined by band peak detector")
+
+
+class SSTVDecodeImageTestCase(unittest.TestCase):
+    """Test decoding whole images with SSTVDecoder"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the audio once, and turn off the progress bar which needs a terminal"""
+        util.set_progress_enabled(False)
+        with open("./test/data/m1.ogg", "rb") as fp:
+            with SSTVDecoder(fp) as decoder:
+                cls.samples, cls.sample_rate = decoder.loaded_audio()
+
+    @classmethod
+    def tearDownClass(cls):
+        util.set_progress_enabled(True)
+
+    def decode_until(self, seconds):
+        """Decodes the audio cut at the given time"""
+        with SSTVDecoder((self.samples[: int(seconds * self.sample_rate)], self.sample_rate)) as decoder:
+            return np.asarray(decoder.decode())
+
+    def test_decode_image(self):
+        """Test decoded image against the example image decoded from the same audio (examples/m1.png)"""
+        image = self.decode_until(len(self.samples) / self.sample_rate).astype(int)
+        expected = np.asarray(Image.open("./examples/m1.png").convert("RGB")).astype(int)
+        self.assertEqual(image.shape, expected.shape)
+
+        # Only rounding of the vectorised math may move a pixel by a level
+        self.assertLessEqual(np.abs(image - expected).max(), 1, "Decoded image is different")
+
+    def test_draw_image(self):
+        """Test the image is drawn from decoded channels in the pixel order of each color format"""
+        rng = np.random.default_rng(0)
+
+        def expected_pixel(mode, image_data, y, x):
+            """The pixel as drawn pixel by pixel"""
+            if mode.CHAN_COUNT == 2:
+                # R36, each pair of lines shares the two chrominance scans
+                odd_line = y % 2
+                return image_data[y][0][x], image_data[y - (odd_line - 1)][1][x], image_data[y - odd_line][1][x]
+            if mode.COLOR == spec.COL_FMT.GBR:
+                return image_data[y][2][x], image_data[y][0][x], image_data[y][1][x]
+            if mode.COLOR == spec.COL_FMT.YUV:
+                return image_data[y][0][x], image_data[y][2][x], image_data[y][1][x]
+            return image_data[y][0][x], image_data[y][1][x], image_data[y][2][x]
+
+        with SSTVDecoder((self.samples[:1000], self.sample_rate)) as decoder:
+            for mode in (spec.R36, spec.R72, spec.M1, spec.S1):
+                decoder.mode = mode
+                shape = (mode.LINE_COUNT, mode.CHAN_COUNT, mode.LINE_WIDTH)
+                image_data = rng.integers(0, 256, shape, dtype=np.uint8)
+
+                pixels = np.array(
+                    [
+                        [expected_pixel(mode, image_data, y, x) for x in range(mode.LINE_WIDTH)]
+                        for y in range(mode.LINE_COUNT)
+                    ],
+                    dtype=np.uint8,
+                )
+                col_mode = "YCbCr" if mode.COLOR == spec.COL_FMT.YUV else "RGB"
+                expected = Image.fromarray(pixels, col_mode).convert("RGB")
+
+                image = decoder._draw_image(image_data)
+                self.assertEqual(image.size, (mode.LINE_WIDTH, mode.LINE_COUNT))
+                np.testing.assert_array_equal(np.asarray(image), np.asarray(expected), f"Wrong pixels of {mode.NAME}")
+
+    def test_decode_truncated_inside_vis(self):
+        """Test audio ending within the VIS code is reported as early end of audio"""
+        with SSTVDecoder((self.samples, self.sample_rate)) as decoder:
+            vis_start = decoder._find_header()
+
+        bit_size = round(spec.VIS_BIT_SIZE * self.sample_rate)
+        with SSTVDecoder((self.samples[: vis_start + 3 * bit_size], self.sample_rate)) as decoder:
+            with self.assertRaises(EOFError):
+                decoder.decode()
+
+    def test_decode_truncated_at_line_boundary(self):
+        """Test audio ending before a sync pulse gives the lines decoded so far"""
+        image = self.decode_until(40.14)
+        self.assertEqual(image.shape, (spec.M1.LINE_COUNT, spec.M1.LINE_WIDTH, 3))
+        self.assertTrue(image[:86].any(axis=(1, 2)).all(), "Decoded lines are empty")
+        self.assertFalse(image[86:].any(), "Lines after end of audio are not empty")
+
+    def test_decode_truncated_inside_line(self):
+        """Test audio ending within a scan gives the pixels decoded so far"""
+        image = self.decode_until(40.2)
+        self.assertEqual(image.shape, (spec.M1.LINE_COUNT, spec.M1.LINE_WIDTH, 3))
+        self.assertTrue(image[:86].any(axis=(1, 2)).all(), "Decoded lines are empty")
+        # Martin scans green first, only the green scan of the last line is partly decoded
+        expected = np.asarray(Image.open("./examples/m1.png").convert("RGB")).astype(int)
+        last_line = image[86].astype(int)
+        self.assertLessEqual(
+            np.abs(last_line[:100, 1] - expected[86, :100, 1]).max(), 1, "Decoded part of the last line is wrong"
+        )
+        self.assertFalse(last_line[200:].any(), "Part of the last line after end of audio is not empty")
+        self.assertFalse(image[87:].any(), "Lines after end of audio are not empty")
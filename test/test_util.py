@@ -0,0 +1,179 @@
+"""Test cases for the logging and progress bar code"""
+
+import logging
+import sys
+import unittest
+from io import StringIO
+from unittest import mock
+
+from desstv import util
+
+
+class UtilTestCase(unittest.TestCase):
+    """Capture standard error, and start every test with clean logging state"""
+
+    def setUp(self):
+        sys.stderr = StringIO()
+        util._stderr_buf.clear()
+        util._stderr_buf_len = 0
+        util._stderr_line_ended = True
+        util._last_frame = None
+        util._last_frame_ns = 0
+
+        # Don't depend on DESSTV_LEVEL of the environment running tests
+        level_patch = mock.patch.object(util, "_min_level", logging.INFO)
+        level_patch.start()
+        self.addCleanup(level_patch.stop)
+        self.addCleanup(util._logger.setLevel, util._logger.level)
+        util._logger.setLevel(logging.INFO)
+
+        # The progress bar needs a terminal width
+        cols_patch = mock.patch.object(util, "_get_cols", return_value=100)
+        cols_patch.start()
+        self.addCleanup(cols_patch.stop)
+
+    def tearDown(self):
+        util._flush_stderr()
+        sys.stderr = sys.__stderr__
+
+
+class LogLevelTestCase(UtilTestCase):
+    """Test level filtering set by DESSTV_LEVEL"""
+
+    def test_parse_level(self):
+        """Test parsing level names and numbers"""
+        self.assertEqual(util._parse_level("WARN"), logging.WARNING)
+        self.assertEqual(util._parse_level("error"), logging.ERROR)
+        self.assertEqual(util._parse_level(" info "), logging.INFO)
+        self.assertEqual(util._parse_level("30"), 30)
+        self.assertEqual(util._parse_level("junk"), logging.INFO)
+        self.assertEqual(util._parse_level(""), logging.INFO)
+
+    def test_error_level(self):
+        """Test only errors are written at ERROR level"""
+        with mock.patch.object(util, "_min_level", logging.ERROR):
+            util.log_info("info %s", "message")
+            util.log_info("recurring %s", "message", recur=True)
+            util.log_warn("warning")
+            util.progress_bar(1, 2, "Decoding image...")
+            util.progress_bar(2, 2, "Decoding image...")
+            util._flush_stderr()
+            self.assertEqual(sys.stderr.getvalue(), "")
+
+            util.log_error("error %d", 1)
+            self.assertEqual(sys.stderr.getvalue(), "[desstv] ERROR | error 1\n")
+
+    def test_info_level(self):
+        """Test all levels are written at INFO level, with their arguments formatted"""
+        with mock.patch.object(util, "_min_level", logging.INFO):
+            util.log_info("info %s", "message")
+            util.log_warn("warning %d%%", 50)
+            util.log_error("error")
+        self.assertEqual(
+            sys.stderr.getvalue(),
+            "[desstv] INFO  | info message\n[desstv] WARN  | warning 50%\n[desstv] ERROR | error\n",
+        )
+
+
+class BufferedStderrTestCase(UtilTestCase):
+    """Test recurring log lines are buffered and written in order"""
+
+    def setUp(self):
+        super().setUp()
+        # Don't let a slow test run flush the buffer by time
+        time_patch = mock.patch.object(util, "_STDERR_BUF_TIME", 3600)
+        time_patch.start()
+        self.addCleanup(time_patch.stop)
+        util._stderr_flushed_at = util.time.monotonic()
+        # As if a frame was just written, so following frames are buffered
+        util._stderr_line_ended = False
+
+    def test_flush_before_normal_line(self):
+        """Test buffered frames are written before the next normal log line, in order"""
+        util.log_info("frame %d", 1, recur=True)
+        util.log_info("frame %d", 2, recur=True)
+        self.assertEqual(sys.stderr.getvalue(), "", "Recurring lines not buffered")
+
+        util.log_info("done")
+        self.assertEqual(
+            sys.stderr.getvalue(), "[desstv] INFO  | frame 1\r[desstv] INFO  | frame 2\r[desstv] INFO  | done\n"
+        )
+
+    def test_flush_stderr(self):
+        """Test flushing drains the buffer"""
+        util.log_info("frame", recur=True)
+        util._flush_stderr()
+        self.assertEqual(sys.stderr.getvalue(), "[desstv] INFO  | frame\r")
+        self.assertEqual(util._stderr_buf, [])
+        self.assertEqual(util._stderr_buf_len, 0)
+
+        # Nothing left to write again
+        util._flush_stderr()
+        self.assertEqual(sys.stderr.getvalue(), "[desstv] INFO  | frame\r")
+
+    def test_flush_by_size(self):
+        """Test the buffer is written once it's larger than the size threshold"""
+        frame_size = len("[desstv] INFO  | frame 0\r")
+        with mock.patch.object(util, "_STDERR_BUF_SIZE", frame_size * 4):
+            for i in range(4):
+                util.log_info("frame %d", i, recur=True)
+            self.assertEqual(sys.stderr.getvalue(), "", "Buffer written before reaching size threshold")
+
+            util.log_info("frame %d", 4, recur=True)
+            self.assertEqual(sys.stderr.getvalue(), "".join(f"[desstv] INFO  | frame {i}\r" for i in range(5)))
+            self.assertEqual(util._stderr_buf, [])
+
+    def test_flush_by_time(self):
+        """Test the buffer is written once it's older than the time threshold"""
+        with mock.patch.object(util, "_STDERR_BUF_TIME", 0):
+            util.log_info("frame", recur=True)
+        self.assertEqual(sys.stderr.getvalue(), "[desstv] INFO  | frame\r")
+
+    def test_first_frame_after_normal_line(self):
+        """Test the frame following a normal line is written at once, and only the frames after it are buffered"""
+        util.log_info("Using cached audio")
+        util.log_info("frame %d", 1, recur=True)
+        self.assertEqual(sys.stderr.getvalue(), "[desstv] INFO  | Using cached audio\n[desstv] INFO  | frame 1\r")
+
+        util.log_info("frame %d", 2, recur=True)
+        self.assertEqual(util._stderr_buf, ["[desstv] INFO  | frame 2\r"])
+
+
+class ProgressBarTestCase(UtilTestCase):
+    """Test the progress bar draws the frames which change what's shown"""
+
+    def frames(self):
+        util._flush_stderr()
+        return sys.stderr.getvalue().replace("\r", "\n").splitlines()
+
+    def test_last_frame_drawn(self):
+        """Test the complete frame is drawn and ends the line, however fast the progress goes"""
+        for i in range(256):
+            util.progress_bar(i, 255, "Decoding image...")
+
+        value = sys.stderr.getvalue()
+        self.assertTrue(value.endswith("100%\n"), "Last frame not complete")
+        # Throttled, the loop is much faster than 30 frames per second
+        self.assertLess(len(self.frames()), 256)
+
+    def test_last_frame_not_throttled(self):
+        """Test the complete frame is drawn right after the previous frame"""
+        util.progress_bar(999, 1000, "Decoding image...")
+        util.progress_bar(1000, 1000, "Decoding image...")
+        frames = self.frames()
+        self.assertEqual(len(frames), 2)
+        self.assertTrue(frames[0].endswith("[" + "#" * 55 + "]  99%"))
+        self.assertTrue(frames[1].endswith("[" + "#" * 55 + "] 100%"))
+
+    def test_identical_frames_skipped(self):
+        """Test ticks which don't change the bar or percent draw nothing"""
+        with mock.patch.object(util, "_FRAME_INTERVAL_NS", 0):
+            util.progress_bar(10, 1000, "Decoding image...")
+            util.progress_bar(10, 1000, "Decoding image...")
+            util.progress_bar(11, 1000, "Decoding image...")
+            self.assertEqual(len(self.frames()), 1)
+
+            util.progress_bar(20, 1000, "Decoding image...")
+            frames = self.frames()
+            self.assertEqual(len(frames), 2)
+            self.assertTrue(frames[1].endswith("   2%"))